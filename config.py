@@ -7,13 +7,27 @@ MONGO_PASSWORD = "rootpassword"
 MONGO_DB = "arbres_db"
 MONGO_COLLECTION = "arbres"
 
+MONGO_URI = (
+    f"mongodb://{MONGO_USER}:{MONGO_PASSWORD}"
+    f"@{MONGO_HOST}:{MONGO_PORT}/"
+    f"?authSource=admin"
+)
+
+# Un seul client (et donc un seul pool de connexions) pour tout le process.
+# Réglé pour les imports en masse : w=1, pas de retryable writes, et
+# compression réseau zstd (zlib si le module zstd n'est pas installé).
+# connect=False : aucune connexion ni thread de monitoring avant le premier
+# usage (importer config ne doit pas démarrer de threads avant un fork).
+_CLIENT = MongoClient(
+    MONGO_URI,
+    connect=False,
+    maxPoolSize=100,
+    w=1,
+    retryWrites=False,
+    compressors="zstd,zlib",
+)
+
 
 def get_collection():
-    uri = (
-        f"mongodb://{MONGO_USER}:{MONGO_PASSWORD}"
-        f"@{MONGO_HOST}:{MONGO_PORT}/"
-        f"?authSource=admin"
-    )
-    client = MongoClient(uri)
-    db = client[MONGO_DB]
+    db = _CLIENT[MONGO_DB]
     return db[MONGO_COLLECTION]
@@ -1,7 +1,8 @@
-import json
 import sys
 from pathlib import Path
 
+import orjson
+
 # Ajoute le dossier racine du projet au PYTHONPATH
 ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT_DIR))
@@ -9,7 +10,37 @@ sys.path.append(str(ROOT_DIR))
 from config import get_collection  # noqa: E402
 
 
-DATA_FILE = ROOT_DIR / "data" / "arbres.json"
+# NDJSON : un arbre par ligne (écrit par unify_arbres.py --dump-json).
+# Équivalent en ligne de commande :
+#   mongoimport --type json --numInsertionWorkers 8 --file data/arbres.ndjson ...
+DATA_FILE = ROOT_DIR / "data" / "arbres.ndjson"
+BATCH_SIZE = 1000
+
+
+def insert_in_batches(collection, docs, batch_size=BATCH_SIZE):
+    """
+    Insère les documents de l'itérable docs par paquets de batch_size
+    (ordered=False : le serveur n'arrête pas au premier échec et peut
+    traiter le paquet en parallèle).
+    Renvoie le nombre de documents insérés.
+    """
+    inserted = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            inserted += _insert_batch(collection, batch)
+            batch = []
+    if batch:
+        inserted += _insert_batch(collection, batch)
+    return inserted
+
+
+def _insert_batch(collection, batch):
+    result = collection.insert_many(
+        batch, ordered=False, bypass_document_validation=True
+    )
+    return len(result.inserted_ids)
 
 
 def main():
@@ -18,14 +49,16 @@ def main():
     if not DATA_FILE.exists():
         raise FileNotFoundError(DATA_FILE)
 
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        arbres = json.load(f)
-
     # Nettoyage avant import (TP)
     collection.delete_many({})
 
-    result = collection.insert_many(arbres)
-    print(f"{len(result.inserted_ids)} arbres insérés dans MongoDB")
+    # Lecture ligne par ligne : les paquets sont insérés au fil du parsing,
+    # la mémoire reste de l'ordre d'un paquet
+    with open(DATA_FILE, "rb") as f:
+        arbres = (orjson.loads(line) for line in f if line.strip())
+        inserted = insert_in_batches(collection, arbres)
+
+    print(f"{inserted} arbres insérés dans MongoDB")
 
 
 if __name__ == "__main__":
@@ -1,75 +1,127 @@
-import json
+import argparse
+import re
+import sys
 from pathlib import Path
+import numpy as np
+import orjson
 import pandas as pd
-import re
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pacsv
+
+# Ajoute le dossier racine du projet au PYTHONPATH
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from config import get_collection  # noqa: E402
+from import_arbres import insert_in_batches  # noqa: E402
 
 
 RAW_DIR = Path("data-raw")
 OUT_DIR = Path("data")
-OUT_FILE = OUT_DIR / "arbres.json"
+OUT_FILE = OUT_DIR / "arbres.ndjson"
 
 # Tes fichiers (on s’adapte à ce que tu as)
 PARIS_FILE = RAW_DIR / "les-arbres.csv"
 HDS_FILE = RAW_DIR / "arbres-remarquables-du-territoire-des-hauts-de-seine-hors-proprietes-privees.csv"
 
-
-def parse_geo_point_2d(val):
+# On ne lit que les colonnes utilisées, toutes en texte : la conversion
+# en nombres est faite par to_float_series (virgules décimales côté HDS).
+# Les colonnes à peu de valeurs distinctes (genres, espèces, communes,
+# arrondissements) sont dictionnaire-encodées -> dtype category en pandas.
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+PARIS_TYPES = {
+    "ARRONDISSEMENT": CATEGORY,
+    "LIBELLE FRANCAIS": pa.string(),
+    "GENRE": CATEGORY,
+    "ESPECE": CATEGORY,
+    "CIRCONFERENCE (cm)": pa.string(),
+    "HAUTEUR (m)": pa.string(),
+    "REMARQUABLE": CATEGORY,
+    "geo_point_2d": pa.string(),
+}
+HDS_TYPES = {
+    "COMMUNE": CATEGORY,
+    "CODE_INSEE": pa.string(),
+    "NOM_FRANCAIS": pa.string(),
+    "NOM_LATIN": pa.string(),
+    "HAUTEUR": pa.string(),
+    "CIRCONFERENCE": pa.string(),
+    "geo_point_2d": pa.string(),
+}
+
+# Un nombre entre 1 et 20 (numéro d'arrondissement), compilé une seule fois
+_INSEE_RE = re.compile(r"\b([1-9]|1\d|20)\b")
+
+
+def read_csv_arrow(path, column_types, encoding="utf8"):
+    """
+    Lit un CSV ';' avec le lecteur pyarrow (multi-thread) et renvoie
+    une pa.Table limitée aux colonnes de column_types.
+    """
+    return pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(
+            encoding=encoding, use_threads=True, block_size=8 << 20
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=";"),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(column_types),
+            column_types=column_types,
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def parse_geo_point_2d_series(s):
     """
     Dans tes datasets, geo_point_2d ressemble souvent à: "48.8326, 2.41145"
-    => (lat, lon). On renvoie {"lon": ..., "lat": ...} comme sur la photo.
+    => (lat, lon). On renvoie un DataFrame avec les colonnes lon / lat,
+    calculé en une passe sur toute la colonne.
     """
-    if pd.isna(val):
-        return {"lon": None, "lat": None}
-    s = str(val).strip()
-    if not s:
-        return {"lon": None, "lat": None}
+    parts = s.astype("string[pyarrow]").str.split(",", n=2, expand=True).reindex(columns=[0, 1])
+    a = to_float_series(parts[0]).to_numpy()
+    b = to_float_series(parts[1]).to_numpy()
 
-    # parfois séparateur virgule
-    parts = [p.strip() for p in s.split(",")]
-    if len(parts) < 2:
-        return {"lon": None, "lat": None}
+    lon, lat = swap_latlon(a, b)
+    return pd.DataFrame({"lon": lon, "lat": lat}, index=s.index)
 
-    try:
-        a = float(parts[0].replace(",", "."))
-        b = float(parts[1].replace(",", "."))
-    except ValueError:
-        return {"lon": None, "lat": None}
 
+def swap_latlon(a, b):
+    """
+    a, b : tableaux NumPy float64 (1re et 2e valeur de geo_point_2d).
+    Renvoie (lon, lat), NaN si l'une des deux valeurs manque.
+    Deux comparaisons vectorisées + np.where, sans boucle Python.
+    """
     # Heuristique: si a ressemble à une latitude (≈48) et b à une longitude (≈2)
     # alors a=lat, b=lon. Sinon on inverse.
-    if -90 <= a <= 90 and -180 <= b <= 180:
-        lat, lon = a, b
-    else:
-        lon, lat = a, b
+    keep = (-90 <= a) & (a <= 90) & (-180 <= b) & (b <= 180)
+    valid = ~(np.isnan(a) | np.isnan(b))
 
-    return {"lon": lon, "lat": lat}
+    lon = np.where(valid, np.where(keep, b, a), np.nan)
+    lat = np.where(valid, np.where(keep, a, b), np.nan)
+    return lon, lat
 
 
-def to_float(val):
-    if pd.isna(val):
-        return None
-    try:
-        return float(str(val).replace(",", ".").strip())
-    except ValueError:
-        return None
+def to_float_series(s):
+    return pd.to_numeric(
+        s.astype("string[pyarrow]").str.replace(",", ".", regex=False).str.strip(),
+        errors="coerce",
+    ).astype(float)
 
 
-def circonference_to_m(val):
+def circonference_to_m_series(s):
     """
     Photo: circonference = 3.05 (m) alors que Paris donne CIRCONFERENCE (cm).
     Donc:
     - Si valeur > 20, on suppose que c'est en cm -> /100
     - Sinon on la garde (déjà en m)
     """
-    x = to_float(val)
-    if x is None:
-        return None
-    if x > 20:  # probablement cm
-        return round(x / 100.0, 2)
-    return round(x, 2)
+    x = to_float_series(s)
+    return np.where(x > 20, np.round(x / 100.0, 2), np.round(x, 2))
 
 
-def compute_insee_from_arrondissement(arr):
+def compute_insee_from_arrondissement_series(arr):
     """
     Gère :
     - "14" → 75114
@@ -77,67 +129,75 @@ def compute_insee_from_arrondissement(arr):
     - "PARIS 7E ARRDT" → 75107
     Sinon None
     """
-    if pd.isna(arr):
-        return None
-
-    s = str(arr).strip().upper()
+    s = arr.astype("string[pyarrow]").str.strip().str.upper()
 
     # cherche un nombre entre 1 et 20 dans la chaîne
-    m = re.search(r"\b([1-9]|1\d|20)\b", s)
-    if not m:
-        return None
+    n = s.str.extract(_INSEE_RE, expand=False)
+    return ("751" + n.str.zfill(2)).where(n.notna())
 
-    n = int(m.group(1))
-    return f"751{n:02d}"
 
+def map_categories(s, func):
+    """
+    Applique func (Series -> Series) aux seules catégories d'une colonne
+    category, puis redéploie le résultat ligne par ligne via les codes.
+    Les NA restent NA.
+    """
+    values = func(pd.Series(s.cat.categories)).astype("string[pyarrow]").to_numpy()
+    values = np.append(values, pd.NA)  # code -1 (NA) -> dernier élément
+    return pd.Series(values[s.cat.codes.to_numpy()], index=s.index, dtype="string[pyarrow]")
 
 
+def strip_categories(s):
+    return map_categories(s, lambda c: c.astype("string[pyarrow]").str.strip())
 
-def unify_paris(df):
-    out = []
-
-    for _, r in df.iterrows():
-        record = {
-            "source": "paris",
-            "commune": None,
-            "code_insee": None,
-            "nom": None,
-            "latin": None,
-            "hauteur": None,
-            "circonference": None,
-            "localisation": {"lon": None, "lat": None},
-        }
-
-        commune = r.get("ARRONDISSEMENT")
-        if not pd.isna(commune):
-            record["commune"] = str(commune).strip()
-
-        record["code_insee"] = compute_insee_from_arrondissement(r.get("ARRONDISSEMENT"))
-
-        nom = r.get("LIBELLE FRANCAIS")
-        if not pd.isna(nom):
-            record["nom"] = str(nom).strip()
-
-        # latin = "GENRE ESPECE" (ex: Taxodium distichum)
-        genre = r.get("GENRE")
-        espece = r.get("ESPECE")
-        g = "" if pd.isna(genre) else str(genre).strip()
-        e = "" if pd.isna(espece) else str(espece).strip()
-        latin = (g + " " + e).strip()
-        record["latin"] = latin if latin else None
 
-        # hauteur = HAUTEUR (m)
-        record["hauteur"] = to_float(r.get("HAUTEUR (m)"))
+def to_arrow_or_category(t):
+    """
+    types_mapper pour Table.to_pandas : colonnes Arrow, sauf les
+    dictionnaires qui deviennent des category pandas.
+    """
+    return None if pa.types.is_dictionary(t) else pd.ArrowDtype(t)
 
-        # circonference en mètres (photo)
-        record["circonference"] = circonference_to_m(r.get("CIRCONFERENCE (cm)"))
 
-        # localisation
-        record["localisation"] = parse_geo_point_2d(r.get("geo_point_2d"))
+def to_records(df_out):
+    """
+    Convertit le DataFrame final en liste de dicts en une seule passe
+    (NaN / NA -> None pour écrire null dans le NDJSON). Les colonnes
+    lon / lat sont regroupées dans localisation à la fin.
+    """
+    df_out = df_out.astype(object).where(df_out.notna(), None)
+    lon = df_out.pop("lon").to_numpy()
+    lat = df_out.pop("lat").to_numpy()
+
+    records = df_out.to_dict(orient="records")
+    for r, x, y in zip(records, lon, lat):
+        r["localisation"] = {"lon": x, "lat": y}
+    return records
+
 
-        out.append(record)
+def unify_paris(df):
+    arr = df["ARRONDISSEMENT"]
+
+    # latin = "GENRE ESPECE" (ex: Taxodium distichum)
+    genre = strip_categories(df["GENRE"]).fillna("")
+    espece = strip_categories(df["ESPECE"]).fillna("")
+    latin = (genre + " " + espece).str.strip()
+
+    df_out = pd.DataFrame({
+        "source": "paris",
+        "commune": strip_categories(arr),
+        "code_insee": map_categories(arr, compute_insee_from_arrondissement_series),
+        "nom": df["LIBELLE FRANCAIS"].astype("string[pyarrow]").str.strip(),
+        "latin": latin.where(latin != ""),
+        # hauteur = HAUTEUR (m)
+        "hauteur": to_float_series(df["HAUTEUR (m)"]),
+        # circonference en mètres (photo)
+        "circonference": circonference_to_m_series(df["CIRCONFERENCE (cm)"]),
+    })
+    # localisation
+    df_out[["lon", "lat"]] = parse_geo_point_2d_series(df["geo_point_2d"])
 
-    return out
+    return df_out
 
 
 def unify_hds(df):
@@ -145,76 +205,77 @@ def unify_hds(df):
     En-tête HDS:
     COMMUNE;DOMAINE;CODE_INSEE;...;NOM_FRANCAIS;NOM_LATIN;...;HAUTEUR;CIRCONFERENCE;...;geo_point_2d
     """
-    out = []
-
-    for _, r in df.iterrows():
-        record = {
-            "source": "hauts-de-seine",
-            "commune": None,
-            "code_insee": None,
-            "nom": None,
-            "latin": None,
-            "hauteur": None,
-            "circonference": None,
-            "localisation": {"lon": None, "lat": None},
-        }
-
-        # commune
-        commune = r.get("COMMUNE")
-        if not pd.isna(commune):
-            record["commune"] = str(commune).strip()
-
+    df_out = pd.DataFrame({
+        "source": "hauts-de-seine",
+        "commune": strip_categories(df["COMMUNE"]),
         # code_insee (déjà fourni)
-        ci = r.get("CODE_INSEE")
-        if not pd.isna(ci):
-            record["code_insee"] = str(ci).strip()
+        "code_insee": df["CODE_INSEE"].astype("string[pyarrow]").str.strip(),
+        "nom": df["NOM_FRANCAIS"].astype("string[pyarrow]").str.strip(),
+        "latin": df["NOM_LATIN"].astype("string[pyarrow]").str.strip(),
+        # hauteur / circonference (souvent en m, mais on sécurise)
+        "hauteur": to_float_series(df["HAUTEUR"]),
+        "circonference": circonference_to_m_series(df["CIRCONFERENCE"]),
+    })
+    # localisation
+    df_out[["lon", "lat"]] = parse_geo_point_2d_series(df["geo_point_2d"])
 
-        # nom / latin
-        nf = r.get("NOM_FRANCAIS")
-        if not pd.isna(nf):
-            record["nom"] = str(nf).strip()
+    return df_out
 
-        nl = r.get("NOM_LATIN")
-        if not pd.isna(nl):
-            record["latin"] = str(nl).strip()
 
-        # hauteur / circonference (souvent en m, mais on sécurise)
-        record["hauteur"] = to_float(r.get("HAUTEUR"))
-        record["circonference"] = circonference_to_m(r.get("CIRCONFERENCE"))
+def load_paris():
+    # CSV avec ';' (vu dans tes en-têtes)
+    paris = read_csv_arrow(PARIS_FILE, PARIS_TYPES, encoding="latin-1")
 
-        # localisation
-        record["localisation"] = parse_geo_point_2d(r.get("geo_point_2d"))
+    # (Option) Si tu veux vraiment garder uniquement les remarquables côté Paris:
+    # REMARQUABLE = "OUI" (dans ton header c’est REMARQUABLE)
+    # Filtré sur la table Arrow, avant de convertir les ~200k lignes en pandas
+    remarquable = pc.utf8_upper(paris["REMARQUABLE"].cast(pa.string()))
+    paris = paris.filter(pc.is_in(remarquable, value_set=pa.array(["OUI", "TRUE", "1"])))
 
-        out.append(record)
+    return unify_paris(paris.to_pandas(types_mapper=to_arrow_or_category))
 
-    return out
 
+def load_hds():
+    hds = read_csv_arrow(HDS_FILE, HDS_TYPES)
+    return unify_hds(hds.to_pandas(types_mapper=to_arrow_or_category))
 
-def main():
-    if not PARIS_FILE.exists():
-        raise FileNotFoundError(f"Fichier manquant: {PARIS_FILE}")
-    if not HDS_FILE.exists():
-        raise FileNotFoundError(f"Fichier manquant: {HDS_FILE}")
 
-    # CSV avec ';' (vu dans tes en-têtes)
-    df_paris = pd.read_csv(PARIS_FILE, sep=";", engine="python", encoding="latin-1")
-    df_hds = pd.read_csv(HDS_FILE, sep=";", engine="python")
-
-    # (Option) Si tu veux vraiment garder uniquement les remarquables côté Paris:
-    # REMARQUABLE = "OUI" (dans ton header c’est REMARQUABLE)
-    if "REMARQUABLE" in df_paris.columns:
-        df_paris = df_paris[df_paris["REMARQUABLE"].astype(str).str.upper().isin(["OUI", "TRUE", "1"])]
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Unifie les arbres Paris + Hauts-de-Seine")
+    parser.add_argument(
+        "--dump-json", action="store_true",
+        help=f"écrit aussi {OUT_FILE} (un objet JSON par ligne), en plus de l'import MongoDB",
+    )
+    return parser.parse_args(argv)
 
-    OUT_DIR.mkdir(exist_ok=True)
 
-    records = []
-    records.extend(unify_paris(df_paris))
-    records.extend(unify_hds(df_hds))
+def main(argv=None):
+    args = parse_args(argv)
 
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(records, f, ensure_ascii=False, indent=2)
+    if not PARIS_FILE.exists():
+        raise FileNotFoundError(f"Fichier manquant: {PARIS_FILE}")
+    if not HDS_FILE.exists():
+        raise FileNotFoundError(f"Fichier manquant: {HDS_FILE}")
 
-    print(f"OK -> {OUT_FILE} ({len(records)} enregistrements)")
+    # Un seul DataFrame final
+    df_out = pd.concat([load_paris(), load_hds()], ignore_index=True)
+    records = to_records(df_out)
+
+    # Avant l'insertion : insert_many ajoute un _id (ObjectId) à chaque dict
+    if args.dump_json:
+        OUT_DIR.mkdir(exist_ok=True)
+        with open(OUT_FILE, "wb") as f:
+            for r in records:
+                f.write(orjson.dumps(r))
+                f.write(b"\n")
+        print(f"OK -> {OUT_FILE} ({len(records)} enregistrements)")
+
+    # Import direct dans MongoDB, sans repasser par le fichier JSON
+    collection = get_collection()
+    # Nettoyage avant import (TP)
+    collection.delete_many({})
+    inserted = insert_in_batches(collection, records)
+    print(f"{inserted} arbres insérés dans MongoDB")
 
 
 if __name__ == "__main__":